@@ -20,10 +20,24 @@
 import sys
 import uuid
 import warnings
-from binascii import crc32
-from collections.abc import Generator, Iterator, Mapping, MutableMapping, Reversible
+from collections.abc import Generator, Iterable, Iterator, Mapping, MutableMapping, Reversible
+from contextlib import suppress
+from functools import lru_cache
+from itertools import chain
 from pathlib import Path
-from typing import TYPE_CHECKING, Any, Literal, Optional
+from typing import TYPE_CHECKING, Any, BinaryIO, Literal, Optional
+
+try:
+    # ISA-L's CRC-32 is the same checksum as zlib's, but folds with vectorized carry-less
+    # multiplication (VPCLMULQDQ), so it's used if 'isal' happens to be installed.
+    from isal.isal_zlib import crc32
+except ImportError:
+    try:
+        # This is the same function 'binascii.crc32' calls when the interpreter was built with zlib.
+        # 'binascii' is kept as the fallback for interpreters built without zlib.
+        from zlib import crc32
+    except ImportError:  # pragma: no cover
+        from binascii import crc32
 
 if TYPE_CHECKING:
     from types import TracebackType
@@ -72,6 +86,19 @@ class sentinel:  # noqa: N801
 """Version of the file format."""
 PICKLE_PROTOCOL: int = 5
 """Pickle protocol used if necessary."""
+WRITE_BUFFER_SIZE: int = 1 << 20
+"""Size in bytes after which buffered writes are flushed to the file."""
+COPY_RANGE_MIN_SIZE: int = 1 << 16
+"""Size in bytes after which contiguous records are copied by the kernel during compaction, where supported."""
+KEY_CACHE_SIZE: int = 4096
+"""Number of pickled keys to keep in memory for repeated access."""
+KEY_CACHE_MAX_KEY_SIZE: int = 256
+"""Maximum memory size in bytes of a key whose pickled form is cached. The cache is shared by all savestates
+for the lifetime of the process, so larger keys are not cached to keep the memory it holds small."""
+CACHEABLE_KEY_TYPES: frozenset[type] = frozenset((str, int))
+"""Key types whose pickled form can be cached. Caching is based on equality, so other types
+(e.g. floats, where 0.0 == -0.0, or tuples, where (1,) == (1.0,)) could return the wrong bytes.
+Bytes are not cached, since pickling them is just a copy with a short header."""
 
 # Struct (un)packing formats. Make sure that the length in bytes when
 # a value is converted by the format string according to this table:
@@ -84,10 +111,35 @@ class sentinel:  # noqa: N801
 KEYVAL_IND_FORMAT: str = "!II"
 KEYVAL_IND_SIZE: int = 8
 
+# The in memory index stores the offset and size of a value packed into a single integer
+# as 'offset << INDEX_SIZE_BITS | size', which takes much less memory than a tuple of two integers.
+INDEX_SIZE_BITS: int = 32
+INDEX_SIZE_MASK: int = (1 << INDEX_SIZE_BITS) - 1
+
+# Compiled versions of the formats above, so that the format strings are not parsed on every call.
+HEADER_STRUCT = struct.Struct(HEADER_FORMAT)
+CHECKSUM_STRUCT = struct.Struct(CHECKSUM_FORMAT)
+KEYVAL_IND_STRUCT = struct.Struct(KEYVAL_IND_FORMAT)
+
+FILE_HEADER: bytes = HEADER_STRUCT.pack(FILE_IDENTIFIER, FILE_FORMAT_VERSION, PICKLE_PROTOCOL)
+"""Header written to new savestate files."""
+
 
 class _SaveStateReadOnly(Mapping, Reversible):
     """SaveState file in read-only mode, error if one doesn't exist."""
 
+    __slots__ = (
+        "__weakref__",
+        "_current_offset",
+        "_data_file_descriptor",
+        "_data_flags",
+        "_data_map",
+        "_dbm_mode",
+        "_index",
+        "_savestate_name",
+        "_verify_checksums",
+    )
+
     def __init__(self, filename: Path, verify_checksums: bool = False, dbm_mode: bool = False) -> None:
         """
         Encapsulate a SaveState file in read-only mode.
@@ -107,12 +159,17 @@ def __init__(self, filename: Path, verify_checksums: bool = False, dbm_mode: boo
         self._data_flags = DATA_OPEN_FLAGS_READONLY
         self._verify_checksums = verify_checksums
 
-        self._index: dict[bytes, tuple[int, int]] = self._load_index(self._savestate_name)
-        """The in memory index. Index 'key' is the name of the stored value in bytes and index 'value' is a Tuple
-        of the offset in bytes in the file to the stored value, and the size of the stored value in bytes."""
+        self._index: dict[bytes, int] = self._load_index(self._savestate_name)
+        """The in memory index. Index 'key' is the name of the stored value in bytes and index 'value' is
+        the offset in bytes in the file to the stored value, and the size of the stored value in bytes,
+        packed into a single integer (see INDEX_SIZE_BITS)."""
+
+        self._data_map: Optional[mmap.mmap] = None
+        """Memory map of the savestate file for reading values without system calls."""
 
         self._data_file_descriptor: int = os.open(self._savestate_name, self._data_flags)
         self._current_offset: int = os.lseek(self._data_file_descriptor, 0, os.SEEK_END)
+        self._data_map = self._map_data()
 
     def __getitem__(self, key: Any) -> Any:
         """
@@ -123,18 +180,21 @@ def __getitem__(self, key: Any) -> Any:
         :raises pickle.PicklingError: Key is not pickleable.
         """
         # [sic] implementing this in _convert_to_bytes would be slower
-        if self._dbm_mode:  # noqa: SIM108
+        if self._dbm_mode:
             key = key.encode() if isinstance(key, str) else key
+        elif type(key) in CACHEABLE_KEY_TYPES and sys.getsizeof(key) <= KEY_CACHE_MAX_KEY_SIZE:
+            key = _convert_key_to_bytes_cached(key)
         else:
             key = self._convert_to_bytes(key)
 
-        offset, size = self._index[key]
-        os.lseek(self._data_file_descriptor, offset, os.SEEK_SET)
+        entry = self._index[key]
+        offset = entry >> INDEX_SIZE_BITS
+        size = entry & INDEX_SIZE_MASK
 
         if not self._verify_checksums:
-            data = os.read(self._data_file_descriptor, size)
+            data = self._read(offset, size)
         else:
-            data = os.read(self._data_file_descriptor, size + CHECKSUM_SIZE)
+            data = self._read(offset, size + CHECKSUM_SIZE)
             data = self._verify_data_checksum(key, data)
 
         # SIC: implementing this in _convert_from_bytes would be slower
@@ -142,17 +202,22 @@ def __getitem__(self, key: Any) -> Any:
             return data
         return self._convert_from_bytes(data)
 
-    def __iter__(self) -> Iterator[bytes]:
-        for key in iter(self._index.keys()):
-            yield self._convert_from_bytes(key)
+    def __iter__(self) -> Iterator[Any]:
+        # Keys are stored as-is in dbm mode, so they don't need to be converted.
+        if self._dbm_mode:
+            return iter(self._index)
+        return map(self._convert_from_bytes, self._index)
 
-    def __reversed__(self) -> Iterator[bytes]:
-        for key in reversed(self._index.keys()):
-            yield self._convert_from_bytes(key)
+    def __reversed__(self) -> Iterator[Any]:
+        if self._dbm_mode:
+            return reversed(self._index)
+        return map(self._convert_from_bytes, reversed(self._index))
 
     def __contains__(self, key: Any) -> bool:
         if self._dbm_mode:
-            return key.encode() if isinstance(key, str) else key in self._index
+            return (key.encode() if isinstance(key, str) else key) in self._index
+        if type(key) in CACHEABLE_KEY_TYPES and sys.getsizeof(key) <= KEY_CACHE_MAX_KEY_SIZE:
+            return _convert_key_to_bytes_cached(key) in self._index
         return self._convert_to_bytes(key) in self._index
 
     def __len__(self) -> int:
@@ -196,26 +261,99 @@ def close(self) -> None:
 
         :raises AttributeError: Savestate closed.
         """
+        self._unmap_data()
         os.close(self._data_file_descriptor)
         # Should be deleted to indicate file is closed to __del__
         delattr(self, "_data_file_descriptor")
+        # Also deleted, so that reading from a closed savestate raises an AttributeError.
+        delattr(self, "_data_map")
 
     def keys(self) -> list[Any]:
         """Return all the keys in the savestate."""
-        return [self._convert_from_bytes(key) for key in self._index]
+        if self._dbm_mode:
+            return list(self._index)
+        return list(map(self._convert_from_bytes, self._index))
 
     def values(self) -> list[Any]:
         """Return all the values in the savestate."""
-        return [self[self._convert_from_bytes(key)] for key in self._index]
+        if self._dbm_mode:
+            return [data for _, data in self._iter_data()]
+        convert_from_bytes = self._convert_from_bytes
+        return [convert_from_bytes(data) for _, data in self._iter_data()]
 
     def items(self) -> list[tuple[Any, Any]]:
         """Return List of key value pairs."""
-        return [(self._convert_from_bytes(key), self[self._convert_from_bytes(key)]) for key in self._index]
+        if self._dbm_mode:
+            return list(self._iter_data())
+        convert_from_bytes = self._convert_from_bytes
+        return [(convert_from_bytes(key), convert_from_bytes(data)) for key, data in self._iter_data()]
 
     def get(self, key: Any, default: Any = None) -> Any:
         """Get value for key in savestate."""
         return self[key] if key in self else default  # noqa: SIM401, RUF100
 
+    def verify_all(self) -> None:
+        """
+        Verify the checksums of all the data in the savestate in a single pass over the file.
+
+        :raises SaveStateChecksumError: Checksum failed for some key.
+        :raises AttributeError: Savestate closed.
+        """
+        contents: mmap.mmap
+        view: memoryview
+        with (
+            mmap.mmap(self._data_file_descriptor, length=0, access=mmap.ACCESS_READ) as contents,
+            memoryview(contents) as view,
+        ):
+            _madvise_sequential(contents)
+            for key, entry in self._index.items():
+                offset = entry >> INDEX_SIZE_BITS
+                size = entry & INDEX_SIZE_MASK
+                # [sic] inlined from '_verify_data_checksum', since a method call per key would be slower
+                checksum = CHECKSUM_STRUCT.unpack_from(view, offset + size)[0]
+                if crc32(view[offset : offset + size], crc32(key)) != checksum:
+                    msg = f"Corrupt data detected: invalid checksum for key {key}."
+                    raise SaveStateChecksumError(msg)
+
+    def _iter_data(self) -> Generator[tuple[bytes, bytes], None, None]:
+        """
+        Iterate over the keys in the index and the data stored for them.
+
+        The data is read from a single memory map of the savestate file,
+        instead of looking up and reading each key separately.
+
+        :raises SaveStateChecksumError: Checksum failed, if checksums are verified.
+        """
+        contents: mmap.mmap
+        with mmap.mmap(self._data_file_descriptor, length=0, access=mmap.ACCESS_READ) as contents:
+            _madvise_sequential(contents)
+            for key, entry in self._index.items():
+                offset = entry >> INDEX_SIZE_BITS
+                size = entry & INDEX_SIZE_MASK
+
+                if not self._verify_checksums:
+                    yield key, contents[offset : offset + size]
+                else:
+                    yield key, self._verify_data_checksum(key, contents[offset : offset + size + CHECKSUM_SIZE])
+
+    def _read(self, offset: int, size: int) -> bytes:
+        """Read 'size' bytes from the given offset in the savestate file."""
+        return self._data_map[offset : offset + size]
+
+    def _map_data(self) -> mmap.mmap:
+        """Create a memory map of the whole savestate file for reading values."""
+        data_map = mmap.mmap(self._data_file_descriptor, length=0, access=mmap.ACCESS_READ)
+        if hasattr(mmap, "MADV_RANDOM"):  # pragma: no cover
+            # Values are read in the order they are requested, so readahead would be mostly wasted.
+            data_map.madvise(mmap.MADV_RANDOM)
+        return data_map
+
+    def _unmap_data(self) -> None:
+        """Close the memory map of the savestate file, if it has been created."""
+        if self._data_map is not None:
+            self._data_map.close()
+            self._data_map = None
+
     def _iter_file_data(self, filename: Path) -> Generator[tuple[bytes, int, int], None, None]:
         """
         Iterate over the stored data.
@@ -238,19 +376,30 @@ def _iter_file_data(self, filename: Path) -> Generator[tuple[bytes, int, int], N
 
             offset: int = HEADER_SIZE
             missing_bytes: int = 0
-            contents: bytes
-            with mmap.mmap(fileno=f.fileno(), length=0, access=mmap.ACCESS_READ) as contents:
+            contents: mmap.mmap
+            view: memoryview
+            with (
+                mmap.mmap(fileno=f.fileno(), length=0, access=mmap.ACCESS_READ) as contents,
+                memoryview(contents) as view,
+            ):
+                file_size = len(contents)
+                _madvise_sequential(contents)
+                if hasattr(mmap, "MADV_WILLNEED"):  # pragma: no cover
+                    # Let the kernel start reading the whole file in the background while it's being parsed.
+                    contents.madvise(mmap.MADV_WILLNEED)
+                # This loop runs for every record in the file, so bind the used functions to local names.
+                unpack_keyval_ind = KEYVAL_IND_STRUCT.unpack_from
+                unpack_checksum = CHECKSUM_STRUCT.unpack_from
                 while True:
-                    if offset >= len(contents):
+                    if offset >= file_size:
                         break  # End of file, so stop reading values
 
                     try:
-                        key_size, val_size = struct.unpack(
-                            KEYVAL_IND_FORMAT, contents[offset : offset + KEYVAL_IND_SIZE]
-                        )
+                        # Unpack directly from the memory map to avoid copying the indicators to a new object.
+                        key_size, val_size = unpack_keyval_ind(view, offset)
                         if key_size == 0:
                             warnings.warn(
-                                f"Zero key size at position {offset}/{len(contents)}. Could not continue to read data.",
+                                f"Zero key size at position {offset}/{file_size}. Could not continue to read data.",
                                 category=BytesWarning,
                                 stacklevel=2,
                             )
@@ -258,13 +407,13 @@ def _iter_file_data(self, filename: Path) -> Generator[tuple[bytes, int, int], N
                     except struct.error:
                         warnings.warn(
                             f"Key and value size indicators could not be unpacked from file "
-                            f"at position {offset}/{len(contents)}.",
+                            f"at position {offset}/{file_size}.",
                             category=BytesWarning,
                             stacklevel=2,
                         )
                         break
 
-                    missing_bytes = (offset + KEYVAL_IND_SIZE + key_size + val_size + CHECKSUM_SIZE) - len(contents)
+                    missing_bytes = (offset + KEYVAL_IND_SIZE + key_size + val_size + CHECKSUM_SIZE) - file_size
                     if missing_bytes > 0:
                         warnings.warn(
                             "Some data is missing at the end of the file. Compaction necessary.",
@@ -277,15 +426,13 @@ def _iter_file_data(self, filename: Path) -> Generator[tuple[bytes, int, int], N
                     key = contents[offset : offset + key_size]
                     offset += key_size
 
-                    try:
-                        self._verify_data_checksum(
-                            key, data_with_checksum=contents[offset : offset + val_size + CHECKSUM_SIZE]
-                        )
+                    # [sic] inlined from '_verify_data_checksum', since a method call per record would be slower
+                    checksum = unpack_checksum(view, offset + val_size)[0]
+                    if crc32(view[offset : offset + val_size], crc32(key)) == checksum:
                         yield key, offset, val_size
-
-                    except SaveStateChecksumError:
+                    else:
                         warnings.warn(
-                            f"Data was corrupted at position {offset}/{len(contents)}. Compaction necessary.",
+                            f"Data was corrupted at position {offset}/{file_size}. Compaction necessary.",
                             category=BytesWarning,
                             stacklevel=2,
                         )
@@ -298,7 +445,7 @@ def _iter_file_data(self, filename: Path) -> Generator[tuple[bytes, int, int], N
             with builtins.open(filename, "ab+") as f:
                 f.write(b"\x00" * missing_bytes)
 
-    def _load_index(self, filename: Path) -> dict[bytes, tuple[int, int]]:
+    def _load_index(self, filename: Path) -> dict[bytes, int]:
         """This method is only used upon instantiation to populate the in memory index."""
         index = {}
 
@@ -313,7 +460,7 @@ def _load_index(self, filename: Path) -> dict[bytes, tuple[int, int]]:
                 # but it should not be included, as it's marked deleted here.
                 del index[key]
             else:
-                index[key] = offset, val_size
+                index[key] = offset << INDEX_SIZE_BITS | val_size
 
         return index
 
@@ -325,6 +472,13 @@ def _convert_to_bytes(value: Any) -> bytes:
     def _convert_from_bytes(value: bytes) -> Any:
         return pickle.loads(value)  # noqa: S301
 
+    @staticmethod
+    def _convert_key_to_bytes(key: Any) -> bytes:
+        """Convert a key to bytes, reusing the result for recently used keys of simple types."""
+        if type(key) in CACHEABLE_KEY_TYPES and sys.getsizeof(key) <= KEY_CACHE_MAX_KEY_SIZE:
+            return _convert_key_to_bytes_cached(key)
+        return pickle.dumps(key, protocol=PICKLE_PROTOCOL)
+
     @staticmethod
     def _verify_header(header: bytes) -> None:
         """
@@ -332,7 +486,13 @@ def _verify_header(header: bytes) -> None:
 
         :raises SaveStateError: File was incorrect type or incompatible version.
         """
-        signature, file_version, pickling_version = struct.unpack(HEADER_FORMAT, header)
+        if header == FILE_HEADER:
+            return  # Header written by this version, so no need to check the fields separately.
+        if len(header) != HEADER_SIZE:
+            msg = "File is not a SaveState file."
+            raise SaveStateLoadError(msg)
+
+        signature, file_version, pickling_version = HEADER_STRUCT.unpack(header)
 
         if signature != FILE_IDENTIFIER:
             msg = "File is not a SaveState file."
@@ -351,20 +511,27 @@ def _verify_data_checksum(key: bytes, data_with_checksum: bytes) -> bytes:
 
         :raises SaveStateChecksumError: Checksum failed.
         """
-        data_no_checksum = data_with_checksum[:-CHECKSUM_SIZE]
-        checksum = struct.unpack(CHECKSUM_FORMAT, data_with_checksum[-CHECKSUM_SIZE:])[0]
-        computed_checksum = crc32(key + data_no_checksum)
+        size = len(data_with_checksum) - CHECKSUM_SIZE
+        checksum = CHECKSUM_STRUCT.unpack_from(data_with_checksum, size)[0]
+        # Continue the key's CRC with the data, so that they don't need to be concatenated.
+        with memoryview(data_with_checksum) as view:
+            computed_checksum = crc32(view[:size], crc32(key))
 
         if computed_checksum != checksum:
             msg = f"Corrupt data detected: invalid checksum for key {key}."
             raise SaveStateChecksumError(msg)
 
-        return data_no_checksum
+        return data_with_checksum[:size]
 
 
 class _SaveStateCreate(MutableMapping, _SaveStateReadOnly):
     """SaveState file in read-write more, create if one doesn't exist."""
 
+    __slots__ = (
+        "_compact",
+        "_write_buffer",
+    )
+
     def __init__(
         self,
         filename: Path,
@@ -384,18 +551,13 @@ def __init__(
         :param dbm_mode: Operate in dbm mode. This is faster,
                          but only allows strings for keys and values.
         """
-        self._savestate_name = filename
-        self._dbm_mode = dbm_mode
-        self._compact = compact
-        self._data_flags = DATA_OPEN_FLAGS
-        self._verify_checksums = verify_checksums
-
-        self._index: dict[bytes, tuple[int, int]] = self._load_index(self._savestate_name)
-        """The in memory index. Index 'key' is the name of the stored value in bytes and index 'value' is a Tuple
-        of the offset in bytes in the file to the stored value, and the size of the stored value in bytes."""
-
-        self._data_file_descriptor: int = os.open(self._savestate_name, self._data_flags)
-        self._current_offset: int = os.lseek(self._data_file_descriptor, 0, os.SEEK_END)
+        self._init_savestate(
+            filename=filename,
+            verify_checksums=verify_checksums,
+            compact=compact,
+            dbm_mode=dbm_mode,
+            index=self._load_index(filename),
+        )
 
     def __setitem__(self, key: Any, value: Any) -> None:
         """
@@ -408,24 +570,14 @@ def __setitem__(self, key: Any, value: Any) -> None:
         if self._dbm_mode:
             key = key.encode() if isinstance(key, str) else key
             value = value.encode() if isinstance(value, str) else value
+        elif type(key) in CACHEABLE_KEY_TYPES and sys.getsizeof(key) <= KEY_CACHE_MAX_KEY_SIZE:
+            key = _convert_key_to_bytes_cached(key)
+            value = self._convert_to_bytes(value)
         else:
             key = self._convert_to_bytes(key)
             value = self._convert_to_bytes(value)
 
-        key_size = len(key)
-        val_size = len(value)
-
-        keyval_size = struct.pack(KEYVAL_IND_FORMAT, key_size, val_size)
-        keyval = key + value
-
-        checksum = struct.pack(CHECKSUM_FORMAT, crc32(keyval))
-
-        blob = keyval_size + keyval + checksum
-        os.write(self._data_file_descriptor, blob)
-
-        # Update the in memory index.
-        self._index[key] = (self._current_offset + KEYVAL_IND_SIZE + key_size, val_size)
-        self._current_offset += len(blob)
+        self._current_offset = self._append_record(key, value, self._current_offset)
 
     def __delitem__(self, key: Any) -> None:
         """
@@ -441,20 +593,25 @@ def __delitem__(self, key: Any) -> None:
         :raises pickle.PicklingError: Key is not pickleable.
         """
         # SIC: implementing this in _convert_to_bytes would be slower
-        if self._dbm_mode:  # noqa: SIM108
+        if self._dbm_mode:
             key = key.encode() if isinstance(key, str) else key
+        elif type(key) in CACHEABLE_KEY_TYPES and sys.getsizeof(key) <= KEY_CACHE_MAX_KEY_SIZE:
+            key = _convert_key_to_bytes_cached(key)
         else:
             key = self._convert_to_bytes(key)
 
+        # Look up the buffer first, so that the index is not modified if the savestate is closed.
+        buffer = self._write_buffer
         del self._index[key]
 
-        key_size = struct.pack(KEYVAL_IND_FORMAT, len(key), DELETED)
-        checksum = struct.pack(CHECKSUM_FORMAT, crc32(key))
+        buffer += KEYVAL_IND_STRUCT.pack(len(key), DELETED)
+        buffer += key
+        buffer += CHECKSUM_STRUCT.pack(crc32(key))
 
-        blob = key_size + key + checksum
-        os.write(self._data_file_descriptor, blob)
+        self._current_offset += KEYVAL_IND_SIZE + len(key) + CHECKSUM_SIZE
 
-        self._current_offset += len(blob)
+        if len(buffer) >= WRITE_BUFFER_SIZE:
+            self._flush()
 
     def close(self, compact: bool = False) -> None:
         """
@@ -471,6 +628,19 @@ def close(self, compact: bool = False) -> None:
 
         self.sync()
         super().close()
+        # Also deleted, so that writing to a closed savestate raises an AttributeError
+        # instead of adding data to the write buffer that will never be written to the file.
+        delattr(self, "_write_buffer")
+
+    def verify_all(self) -> None:
+        """
+        Verify the checksums of all the data in the savestate in a single pass over the file.
+
+        :raises SaveStateChecksumError: Checksum failed for some key.
+        :raises AttributeError: Savestate closed.
+        """
+        self._flush()
+        super().verify_all()
 
     def sync(self) -> None:
         """
@@ -483,7 +653,7 @@ def sync(self) -> None:
 
         :raises AttributeError: Savestate closed.
         """
-        # The files are opened unbuffered, so we don't technically need to flush the file objects.
+        self._flush()
         os.fsync(self._data_file_descriptor)
 
     def compact(self) -> None:
@@ -491,34 +661,31 @@ def compact(self) -> None:
         Rewrite the contents of the savestate file.
 
         This method is needed because of the append-only nature of the file format.
-        Basically, compaction works by opening a new savestate, writing all the keys
-        from this savestate to the new savestate, renaming the
-        new savestate to the filename associated with this savestate,
-        and reopening the new savestate as this savestate.
+        Basically, compaction works by copying the data of all the keys in this savestate
+        as-is to a new file, renaming the new file to the filename associated with
+        this savestate, and reopening the new file as this savestate.
 
         Compaction is optional, since it's a trade-off between speed and storage space used.
         As a general rule of thumb, the more non-read updates you do, the more space you'll save when you compact.
         """
-        # Copy the file and close it, and the current file
-        new_filename = self._savestate_name.with_stem(self._savestate_name.stem + f"_{uuid.uuid4()}")
-        new_savestate = self.copy(new_filename)
-        new_savestate.close()
-        os.close(self._data_file_descriptor)
-
-        # Rename the new file to the current file, replacing it in the process.
-        self._rename(from_file=new_savestate._savestate_name, to_file=self._savestate_name)
+        self._flush()
 
-        # Open the new file as the current file.
-        self._index: dict[bytes, tuple[int, int]] = new_savestate._index
-        self._data_file_descriptor: int = os.open(self._savestate_name, self._data_flags)
-        self._current_offset: int = new_savestate._current_offset
+        # Copy the current data to a new file
+        new_filename = self._savestate_name.with_stem(self._savestate_name.stem + f"_{uuid.uuid4()}")
+        self._write_headers(new_filename)
+        index = self._copy_records(new_filename)
+        self._replace_file(new_filename, index)
 
     def clear(self) -> None:
         """Delete all data from the savestate."""
-        for key in self.keys():
-            self.pop(key)
-        self._index = {}
-        self.compact()
+        # Nothing in the file needs to be kept, so replace it with a file with only the headers
+        # instead of marking every key deleted and compacting the file. The file isn't truncated
+        # in place, since other savestates might have it memory mapped, and reading the mapped
+        # pages past the end of the truncated file would crash the interpreter.
+        self._write_buffer.clear()
+        new_filename = self._savestate_name.with_stem(self._savestate_name.stem + f"_{uuid.uuid4()}")
+        self._write_headers(new_filename)
+        self._replace_file(new_filename, {})
 
     def setdefault(self, key: Any, default: Any = None) -> Any:
         """
@@ -526,9 +693,9 @@ def setdefault(self, key: Any, default: Any = None) -> Any:
         If not, insert key with a value of default and return default.
         """
         if self._dbm_mode:
-            contains = key.encode() if isinstance(key, str) else key in self._index
+            contains = (key.encode() if isinstance(key, str) else key) in self._index
         else:
-            contains = self._convert_to_bytes(key) in self._index
+            contains = self._convert_key_to_bytes(key) in self._index
 
         if contains:
             return self[key]
@@ -560,35 +727,258 @@ def popitem(self) -> tuple[Any, Any]:
         """
         key, value = self._index.popitem()
         self._index[key] = value
-        key = self._convert_from_bytes(key)
+        if not self._dbm_mode:
+            key = self._convert_from_bytes(key)
         value = self.pop(key)
         return key, value
 
     def copy(self, new_filename: Path) -> _SaveStateCreate | _SaveStateReadWrite | _SaveStateNew:
-        """Creates a copy of this savestate by writing all the keys from this savestate to the new savestate."""
+        """
+        Creates a copy of this savestate by copying the data of all the keys from this savestate to the new savestate.
+        The data is copied as-is, so it doesn't need to be converted or checksummed again.
+        """
         new_filename = _add_file_identifier(new_filename)
-        assert new_filename != self._savestate_name, "Copy can't have the same filename as the original."  # noqa: S101
+        # Compare the files instead of the paths, since the same file can be referred to with different paths.
+        if new_filename.is_file() and new_filename.samefile(self._savestate_name):
+            msg = "Copy can't have the same file as the original."
+            raise SaveStateError(msg)
 
-        new_savestate = self.__class__(
+        # Copy the data to a temporary file first, so that an existing file is only replaced by a complete copy.
+        self._flush()
+        temp_filename = new_filename.with_stem(new_filename.stem + f"_{uuid.uuid4()}")
+        self._write_headers(temp_filename)
+        index = self._copy_records(temp_filename)
+        self._rename(from_file=temp_filename, to_file=new_filename)
+
+        # The copy has already been created and its index is known, so open it directly
+        # instead of through '__init__', which would load the index from the file again,
+        # or, for a new savestate, delete the copy it's opened for.
+        new_savestate = object.__new__(self.__class__)
+        new_savestate._init_savestate(
             filename=new_filename,
             verify_checksums=self._verify_checksums,
             compact=self._compact,
+            dbm_mode=self._dbm_mode,
+            index=index,
         )
-
-        for key in iter(self):  # Gives the keys converted from bytes
-            new_savestate[key] = self[key]
-
         return new_savestate
 
-    def update(self, other: Mapping[Any, Any], **kwargs: Any) -> None:
+    def update(self, other: Mapping[Any, Any] | Iterable[tuple[Any, Any]] = (), **kwargs: Any) -> None:
         """
         Update the savestate with the keys and value in other or with given kwargs.
+        Other can be a mapping or an iterable of key value pairs, like for 'dict.update'.
         If both are present, kwargs will overwrite keys given in the other.
         """
-        for key, value in other.items():
-            self[key] = value
-        for key, value in kwargs.items():
-            self[key] = value
+        # Like 'dict.update', treat any object with a 'keys' method as a mapping, not only registered Mappings.
+        if hasattr(other, "keys"):
+            mapping = other
+            other = ((key, mapping[key]) for key in mapping.keys())  # noqa: SIM118
+
+        # [sic] the items are converted here instead of calling __setitem__ for each item,
+        # since looking up the attributes and calling the method for every item would be slower
+        dbm_mode = self._dbm_mode
+        append_record = self._append_record
+        offset = self._current_offset
+        try:
+            for key, value in chain(other, kwargs.items()):
+                if dbm_mode:
+                    key_bytes = key.encode() if isinstance(key, str) else key
+                    value_bytes = value.encode() if isinstance(value, str) else value
+                elif type(key) in CACHEABLE_KEY_TYPES and sys.getsizeof(key) <= KEY_CACHE_MAX_KEY_SIZE:
+                    key_bytes = _convert_key_to_bytes_cached(key)
+                    value_bytes = pickle.dumps(value, protocol=PICKLE_PROTOCOL)
+                else:
+                    key_bytes = pickle.dumps(key, protocol=PICKLE_PROTOCOL)
+                    value_bytes = pickle.dumps(value, protocol=PICKLE_PROTOCOL)
+
+                offset = append_record(key_bytes, value_bytes, offset)
+        finally:
+            # Keep the offset in sync with the items written so far, even if some item can't be converted.
+            self._current_offset = offset
+
+    def _append_record(self, key: bytes, value: bytes, offset: int) -> int:
+        """
+        Append the record for the given key and value to the write buffer, and add the key to the index.
+        The record is placed at the given offset in the file. Return the offset after the record.
+        """
+        key_size = len(key)
+        val_size = len(value)
+        val_offset = KEYVAL_IND_SIZE + key_size
+
+        # Append the parts to the write buffer instead of concatenating them,
+        # which would create an intermediate copy of the data for each part.
+        buffer = self._write_buffer
+        buffer += KEYVAL_IND_STRUCT.pack(key_size, val_size)
+        buffer += key
+        if val_size < WRITE_BUFFER_SIZE:
+            buffer += value
+        else:
+            # Write large values directly to the file instead of copying them to the write buffer first.
+            self._flush()
+            self._write(value)
+        buffer += CHECKSUM_STRUCT.pack(crc32(value, crc32(key)))
+
+        # Update the in memory index.
+        self._index[key] = (offset + val_offset) << INDEX_SIZE_BITS | val_size
+
+        if len(buffer) >= WRITE_BUFFER_SIZE:
+            self._flush()
+
+        return offset + val_offset + val_size + CHECKSUM_SIZE
+
+    def _iter_data(self) -> Generator[tuple[bytes, bytes], None, None]:
+        """Flush the write buffer before iterating, so that all the data can be read from the file."""
+        self._flush()
+        return super()._iter_data()
+
+    def _init_savestate(
+        self,
+        filename: Path,
+        verify_checksums: bool,
+        compact: bool,
+        dbm_mode: bool,
+        index: dict[bytes, int],
+    ) -> None:
+        """Set up the savestate for the given file, using the given index for its contents."""
+        self._savestate_name = filename
+        self._dbm_mode = dbm_mode
+        self._compact = compact
+        self._data_flags = DATA_OPEN_FLAGS
+        self._verify_checksums = verify_checksums
+
+        # The file grows with every flush, so the memory map is created when values are read from the file.
+        self._data_map: Optional[mmap.mmap] = None
+
+        self._write_buffer = bytearray()
+        """Data that has been added to the savestate, but not yet written to the file."""
+
+        self._open_file(index)
+
+    def _replace_file(self, new_filename: Path, index: dict[bytes, int]) -> None:
+        """Replace the savestate file with the given file, and open it as the current file with the given index."""
+        self._unmap_data()
+        os.close(self._data_file_descriptor)
+
+        # Rename the new file to the current file, replacing it in the process.
+        self._rename(from_file=new_filename, to_file=self._savestate_name)
+        self._open_file(index)
+
+    def _open_file(self, index: dict[bytes, int]) -> None:
+        """Open the savestate file for reading and writing, using the given index for its contents."""
+        self._index: dict[bytes, int] = index
+        """The in memory index. Index 'key' is the name of the stored value in bytes and index 'value' is
+        the offset in bytes in the file to the stored value, and the size of the stored value in bytes,
+        packed into a single integer (see INDEX_SIZE_BITS)."""
+
+        self._data_file_descriptor: int = os.open(self._savestate_name, self._data_flags)
+        self._current_offset: int = os.lseek(self._data_file_descriptor, 0, os.SEEK_END)
+
+    def _copy_records(self, filename: Path) -> dict[bytes, int]:
+        """
+        Copy the records of all the keys in the index from the savestate file to the end of the given file.
+        The records are copied as-is, so they don't need to be converted or checksummed again.
+        Return the index for the given file.
+        """
+        index: dict[bytes, int] = {}
+
+        contents: mmap.mmap
+        view: memoryview
+        with (
+            builtins.open(filename, "r+b") as f,
+            mmap.mmap(self._data_file_descriptor, length=0, access=mmap.ACCESS_READ) as contents,
+            memoryview(contents) as view,
+        ):
+            offset = f.seek(0, os.SEEK_END)
+            _madvise_sequential(contents)
+
+            if hasattr(os, "posix_fallocate"):  # pragma: no cover
+                # The final size of the file is known, so allocate the space for it at once,
+                # instead of the file system allocating more space on every write.
+                total_size = sum(
+                    KEYVAL_IND_SIZE + len(key) + (entry & INDEX_SIZE_MASK) + CHECKSUM_SIZE
+                    for key, entry in self._index.items()
+                )
+                # Not all file systems support this, but it's only an optimization.
+                if total_size > 0:
+                    with suppress(OSError):
+                        os.posix_fallocate(f.fileno(), offset, total_size)
+
+            # Records that are next to each other in this file are copied together.
+            run_start = run_end = 0
+            for key, entry in self._index.items():
+                val_offset = entry >> INDEX_SIZE_BITS
+                val_size = entry & INDEX_SIZE_MASK
+                val_start = KEYVAL_IND_SIZE + len(key)
+                record_size = val_start + val_size + CHECKSUM_SIZE
+                record_start = val_offset - val_start
+
+                if record_start != run_end:
+                    self._copy_range(f, view, run_start, run_end)
+                    run_start = record_start
+                run_end = record_start + record_size
+
+                index[key] = (offset + val_start) << INDEX_SIZE_BITS | val_size
+                offset += record_size
+
+            self._copy_range(f, view, run_start, run_end)
+
+            # Make sure there is no unused space left at the end of the file if preallocation failed midway.
+            f.truncate()
+            f.flush()
+            os.fsync(f.fileno())
+
+        return index
+
+    def _copy_range(self, f: BinaryIO, view: memoryview, start: int, end: int) -> None:
+        """Copy the data between the given offsets in the savestate file to the end of the given file."""
+        if end - start >= COPY_RANGE_MIN_SIZE and hasattr(os, "copy_file_range"):
+            # Let the kernel copy large ranges between the files without passing the data through python.
+            # Some file systems can even share the data between the files instead of copying it.
+            f.flush()
+            offset = f.tell()
+            # If the kernel can't copy the range, e.g., due to the file system, copy the rest below.
+            with suppress(OSError):
+                while start < end:
+                    copied = os.copy_file_range(self._data_file_descriptor, f.fileno(), end - start, start, offset)
+                    if copied == 0:  # pragma: no cover
+                        break
+                    start += copied
+                    offset += copied
+            f.seek(offset)
+
+        f.write(view[start:end])
+
+    def _read(self, offset: int, size: int) -> bytes:
+        """Read 'size' bytes from the given offset, either from the savestate file or from the write buffer."""
+        buffer_start = self._current_offset - len(self._write_buffer)
+        if offset >= buffer_start:
+            start = offset - buffer_start
+            return bytes(self._write_buffer[start : start + size])
+        if offset + size > buffer_start:
+            # Only part of the data has been written to the file, e.g., a large value without its checksum.
+            self._flush()
+
+        data_map = self._data_map
+        if data_map is None or offset + size > len(data_map):
+            # The file has grown since it was mapped, so map it again to include the new data.
+            self._unmap_data()
+            data_map = self._data_map = self._map_data()
+        return data_map[offset : offset + size]
+
+    def _flush(self) -> None:
+        """Write the contents of the write buffer to the savestate file."""
+        if not self._write_buffer:
+            return
+        self._write(self._write_buffer)
+        self._write_buffer.clear()
+
+    def _write(self, data: bytes | bytearray) -> None:
+        """Write the data to the end of the savestate file."""
+        with memoryview(data) as view:
+            written = os.write(self._data_file_descriptor, view)
+            # A single write can be cut short, e.g., if the data is larger than 2 GiB on Linux.
+            while written < len(view):
+                written += os.write(self._data_file_descriptor, view[written:])
 
     @staticmethod
     def _rename(from_file: Path, to_file: Path) -> None:
@@ -597,29 +987,16 @@ def _rename(from_file: Path, to_file: Path) -> None:
 
         :raises OSError: File can't be renamed. Possibly being used by another process.
         """
-        if sys.platform.startswith("win"):  # pragma: no cover
-            import ctypes
-            from ctypes.wintypes import DWORD, LPVOID
-
-            lpct_str = ctypes.c_wchar_p
-            kernel32 = ctypes.windll.kernel32
-            kernel32.ReplaceFile.argtypes = [lpct_str, lpct_str, lpct_str, DWORD, LPVOID, LPVOID]
-
-            rc = kernel32.ReplaceFile(lpct_str(str(to_file)), lpct_str(str(from_file)), None, 0, None, None)
-            if rc == 0:
-                msg = f"Can't rename file, error: {kernel32.GetLastError()}"
-                raise OSError(msg)
-
-        else:  # pragma: no cover
-            os.rename(from_file, to_file)  # noqa: PTH104
+        # Replacing the file is atomic on all platforms, as long as the files are on the same file system.
+        from_file.replace(to_file)
 
     @staticmethod
     def _write_headers(filename: Path) -> None:
         """Write the header onto the file."""
         with builtins.open(filename, "wb") as f:
-            f.write(struct.pack(HEADER_FORMAT, FILE_IDENTIFIER, FILE_FORMAT_VERSION, PICKLE_PROTOCOL))
+            f.write(FILE_HEADER)
 
-    def _load_index(self, filename: Path) -> dict[bytes, tuple[int, int]]:
+    def _load_index(self, filename: Path) -> dict[bytes, int]:
         """This method is only used upon instantiation to populate the in memory index."""
         if not os.path.isfile(filename):  # noqa: PTH113
             self._write_headers(filename)
@@ -631,6 +1008,8 @@ def _load_index(self, filename: Path) -> dict[bytes, tuple[int, int]]:
 class _SaveStateReadWrite(_SaveStateCreate):
     """SaveState file in read-write mode, error if doesn't exist."""
 
+    __slots__ = ()
+
     def __init__(
         self,
         filename: Path,
@@ -661,40 +1040,12 @@ def __init__(
             dbm_mode=dbm_mode,
         )
 
-    def copy(self, new_filename: Path):  # noqa: ANN202
-        # File needs to be opened in 'create' mode so that '__init__' does not raise 'SaveStateError' for the copy.
-        # After copying, both of them can be closed and opened in 'read-write' mode.
-
-        new_filename = _add_file_identifier(new_filename)
-        assert new_filename != self._savestate_name, "Copy can't have the same filename as the original."  # noqa: S101
-
-        self.close()
-        same_savestate = open(
-            filename=self._savestate_name,
-            flag="c",
-            verify_checksums=self._verify_checksums,
-            compact=self._compact,
-        )
-        new_savestate = same_savestate.copy(new_filename=new_filename)
-        same_savestate.close()
-        new_savestate.close()
-
-        super().__init__(
-            filename=self._savestate_name,
-            verify_checksums=self._verify_checksums,
-            compact=self._compact,
-        )
-        return open(
-            filename=new_filename,
-            flag="w",
-            verify_checksums=self._verify_checksums,
-            compact=self._compact,
-        )
-
 
 class _SaveStateNew(_SaveStateCreate):
     """SaveState File will always be created, even if one exists."""
 
+    __slots__ = ()
+
     def __init__(
         self,
         filename: Path,
@@ -724,6 +1075,18 @@ def __init__(
         )
 
 
+@lru_cache(maxsize=KEY_CACHE_SIZE, typed=True)
+def _convert_key_to_bytes_cached(key: str | int) -> bytes:
+    return pickle.dumps(key, protocol=PICKLE_PROTOCOL)
+
+
+def _madvise_sequential(contents: mmap.mmap) -> None:
+    """Advise the kernel that the memory map will be read once from start to end, where supported."""
+    if hasattr(mmap, "MADV_SEQUENTIAL"):  # pragma: no cover
+        # Pages are read ahead more aggressively, and reclaimed sooner after they have been read.
+        contents.madvise(mmap.MADV_SEQUENTIAL)
+
+
 def _add_file_identifier(filename: Path) -> Path:
     """Adds savestate file identifier to the path."""
     if filename.suffix == FILE_SUFFIX:
@@ -2,7 +2,10 @@
 import pickle
 import re
 import struct
+import sys
+import weakref
 from argparse import Namespace
+from pathlib import Path
 
 import pytest
 
@@ -246,6 +249,38 @@ def test_close_method():
     with pytest.raises(AttributeError):
         x = db["foo"]
 
+    with savestate.open(filename=SAVESTATE_FILE, flag="r") as db:
+        assert db["foo"] == "bar"
+
+    assert not hasattr(db, "_data_file_descriptor")
+    with pytest.raises(AttributeError):
+        x = db["foo"]
+
+
+def test_writing_to_closed_savestate_raises_error():
+    with savestate.open(filename=SAVESTATE_FILE, flag="n") as db:
+        db["foo"] = "bar"
+
+    with pytest.raises(AttributeError):
+        db["one"] = 1
+    with pytest.raises(AttributeError):
+        del db["foo"]
+    with pytest.raises(AttributeError):
+        db.update({"two": 2})
+
+    assert len(db) == 1
+
+    with savestate.open(filename=SAVESTATE_FILE, flag="r") as db:
+        assert db.items() == [("foo", "bar")]
+
+
+def test_weak_reference():
+    with savestate.open(filename=SAVESTATE_FILE, flag="n") as db:
+        assert weakref.ref(db)() is db
+
+    with savestate.open(filename=SAVESTATE_FILE, flag="r") as db:
+        assert weakref.ref(db)() is db
+
 
 def test_sync_method():
     with savestate.open(filename=SAVESTATE_FILE, flag="n") as db:
@@ -256,6 +291,43 @@ def test_sync_method():
         db.sync()
 
 
+def test_writes_are_buffered_until_sync(savestate_db):
+    before = os.path.getsize(savestate_db.filepath)
+
+    savestate_db["foo"] = "bar"
+    assert os.path.getsize(savestate_db.filepath) == before
+    assert savestate_db["foo"] == "bar"
+    assert os.path.getsize(savestate_db.filepath) == before
+
+    savestate_db["one"] = 1
+    savestate_db.sync()
+    assert os.path.getsize(savestate_db.filepath) == savestate_db._current_offset
+    assert savestate_db["foo"] == "bar"
+
+    savestate_db["two"] = 2
+    savestate_db.sync()
+    assert savestate_db["two"] == 2
+
+
+def test_large_values_are_written_directly():
+    value = bytearray(os.urandom(savestate.savestate.WRITE_BUFFER_SIZE + 1))
+
+    with savestate.open(filename=SAVESTATE_FILE, flag="n") as db:
+        db["foo"] = "bar"
+        db["large"] = value
+        db["baz"] = "qux"
+        assert db["large"] == value
+
+    with savestate.open(filename=SAVESTATE_FILE, flag="c", verify_checksums=True) as db:
+        db["large"] = value
+        assert db["large"] == value
+
+    with savestate.open(filename=SAVESTATE_FILE, flag="r", verify_checksums=True) as db:
+        assert db["foo"] == "bar"
+        assert db["large"] == value
+        assert db["baz"] == "qux"
+
+
 def test_contains_method(savestate_db):
     savestate_db["foo"] = "bar"
     assert "foo" in savestate_db
@@ -356,6 +428,42 @@ def test_clear_method():
     assert after < before
 
 
+def test_set_after_clear():
+    with savestate.open(filename=SAVESTATE_FILE, flag="n") as db:
+        db["one"] = "bar"
+        db["two"] = "bar"
+        db.sync()
+        assert db["two"] == "bar"
+        db["three"] = "bar"
+        db.clear()
+        assert len(db) == 0
+        assert os.path.getsize(db.filepath) == 13
+
+        db["one"] = "baz"
+        assert db["one"] == "baz"
+        db.sync()
+        assert db["one"] == "baz"
+
+    with savestate.open(filename=SAVESTATE_FILE, flag="r") as db:
+        assert db.items() == [("one", "baz")]
+
+
+def test_clear_while_savestate_is_open_for_reading():
+    with savestate.open(filename=SAVESTATE_FILE, flag="n") as db:
+        for i in range(2000):
+            db[i] = i
+        db.sync()
+
+        with savestate.open(filename=SAVESTATE_FILE, flag="r") as reader:
+            db.clear()
+            # The reader still sees the data from when it was opened.
+            assert reader[1999] == 1999
+            assert len(db) == 0
+
+    with savestate.open(filename=SAVESTATE_FILE, flag="r") as db:
+        assert len(db) == 0
+
+
 def test_setdefault_method(savestate_db):
     savestate_db["foo"] = "bar"
     value = savestate_db.setdefault("foo", "baz")
@@ -374,6 +482,53 @@ def test_update_method(savestate_db):
     assert savestate_db["two"] == 2
 
 
+def test_update_method_with_pairs(savestate_db):
+    savestate_db.update([("foo", "bar"), ("one", 1)], foo="baz")
+    assert savestate_db.items() == [("foo", "baz"), ("one", 1)]
+
+
+def test_update_method_with_dict_like_object(savestate_db):
+    class DictLike:
+        def __init__(self, data):
+            self.data = data
+
+        def keys(self):
+            return self.data.keys()
+
+        def __getitem__(self, key):
+            return self.data[key]
+
+    savestate_db.update(DictLike({"ab": 1, "cd": 2}))
+    assert savestate_db.items() == [("ab", 1), ("cd", 2)]
+
+
+def test_update_method_keeps_items_written_before_failure():
+    with savestate.open(filename=SAVESTATE_FILE, flag="n") as db:
+        with pytest.raises((pickle.PicklingError, AttributeError)):
+            db.update([("one", 1), ("two", lambda: 2)])
+        db["three"] = 3
+
+    with savestate.open(filename=SAVESTATE_FILE, flag="r") as db:
+        assert db.items() == [("one", 1), ("three", 3)]
+
+
+def test_values_method_verifies_checksums():
+    with savestate.open(filename=SAVESTATE_FILE, flag="n", verify_checksums=True) as db:
+        db["one"] = 1
+        db["two"] = 2
+        assert db.values() == [1, 2]
+
+    with savestate.open(filename=SAVESTATE_FILE, flag="r", verify_checksums=True) as db:
+        assert db.values() == [1, 2]
+
+        with open(db.filepath, "r+b") as f:
+            f.seek(13 + 8 + 18 + 4)
+            f.write(b"\x00" * 4)
+
+        with pytest.raises(savestate.SaveStateChecksumError):
+            db.values()
+
+
 def test_copy_method():
     copyfile = SAVESTATE_DIR / "testcopy"
 
@@ -392,6 +547,62 @@ def test_copy_method():
         assert not hasattr(db, "copy")
 
 
+def test_copy_method_copies_current_data():
+    copyfile = SAVESTATE_DIR / "testcopy"
+
+    with savestate.open(filename=SAVESTATE_FILE, flag="n", dbm_mode=True) as db:
+        db["one"] = "foo"
+        db["two"] = "bar"
+        db["one"] = "baz"
+        del db["two"]
+        db["three"] = "qux"
+        new_db = db.copy(copyfile)
+        try:
+            assert new_db.items() == [(b"one", b"baz"), (b"three", b"qux")]
+            new_db["four"] = "quux"
+            assert "four" not in db
+        finally:
+            new_db.close()
+
+    with savestate.open(filename=copyfile, flag="r", verify_checksums=True, dbm_mode=True) as new_db:
+        new_db.verify_all()
+        assert new_db.items() == [(b"one", b"baz"), (b"three", b"qux"), (b"four", b"quux")]
+
+    os.remove(new_db.filepath)
+
+
+def test_copy_method_to_the_same_file_raises_error():
+    with savestate.open(filename=SAVESTATE_FILE, flag="c") as db:
+        for i in range(100):
+            db[i] = i
+
+        relative_path = Path(os.path.relpath(SAVESTATE_FILE))
+        with pytest.raises(savestate.SaveStateError, match="Copy can't have the same file as the original."):
+            db.copy(relative_path)
+
+        assert len(db) == 100
+
+    with savestate.open(filename=SAVESTATE_FILE, flag="r") as db:
+        assert len(db) == 100
+
+
+@pytest.mark.skipif(sys.platform.startswith("win"), reason="Creating symlinks requires privileges on Windows.")
+def test_copy_method_to_a_symlink_of_the_same_file_raises_error():
+    with savestate.open(filename=SAVESTATE_FILE, flag="c") as db:
+        for i in range(100):
+            db[i] = i
+
+        symlink = SAVESTATE_DIR / "testlink.savestate"
+        symlink.symlink_to(db.filepath)
+        with pytest.raises(savestate.SaveStateError, match="Copy can't have the same file as the original."):
+            db.copy(symlink)
+
+        assert len(db) == 100
+
+    with savestate.open(filename=SAVESTATE_FILE, flag="r") as db:
+        assert len(db) == 100
+
+
 def test_covert_to_bytes(savestate_db):
     assert savestate_db._convert_to_bytes("foo") == pickle.dumps("foo", protocol=5)
 
@@ -401,6 +612,55 @@ def test_covert_from_bytes(savestate_db):
     assert savestate_db._convert_from_bytes(value) == pickle.loads(value)
 
 
+def test_covert_key_to_bytes(savestate_db):
+    for key in ("foo", b"foo", 1, True, 1.0, -0.0, (1,), (1.0,)):
+        assert savestate_db._convert_key_to_bytes(key) == pickle.dumps(key, protocol=5)
+
+
+def test_only_small_keys_are_cached(savestate_db):
+    cache = savestate.savestate._convert_key_to_bytes_cached
+    cache.cache_clear()
+
+    savestate_db["x" * 1000] = 1
+    savestate_db[b"foo"] = 2
+    assert cache.cache_info().currsize == 0
+
+    savestate_db["foo"] = 3
+    savestate_db[1] = 4
+    assert cache.cache_info().currsize == 2
+
+    assert savestate_db["x" * 1000] == 1
+    assert savestate_db[b"foo"] == 2
+
+
+def test_equal_keys_of_different_types_are_different_keys(savestate_db):
+    savestate_db[1] = "int"
+    savestate_db[1.0] = "float"
+    savestate_db[True] = "bool"
+    assert savestate_db[1] == "int"
+    assert savestate_db[1.0] == "float"
+    assert savestate_db[True] == "bool"
+
+
+def test_dbm_mode():
+    with savestate.open(filename=SAVESTATE_FILE, flag="n", dbm_mode=True) as db:
+        db["foo"] = "bar"
+        db[b"one"] = b"baz"
+        assert db["foo"] == b"bar"
+        assert db[b"foo"] == b"bar"
+        assert db["one"] == b"baz"
+        assert "foo" in db
+        assert "two" not in db
+        assert db.setdefault("two", "qux") == "qux"
+        assert db["two"] == b"qux"
+        del db["foo"]
+        assert "foo" not in db
+        assert db.keys() == [b"one", b"two"]
+        assert list(reversed(db)) == [b"two", b"one"]
+        assert db.items() == [(b"one", b"baz"), (b"two", b"qux")]
+        assert db.popitem() == (b"two", b"qux")
+
+
 def test_verify_checksums():
     with savestate.open(filename=SAVESTATE_FILE, flag="n") as db:
         db["foo"] = "bar"
@@ -412,6 +672,24 @@ def test_verify_checksums():
             pytest.fail("Checksum failed.")
 
 
+def test_verify_all():
+    with savestate.open(filename=SAVESTATE_FILE, flag="n") as db:
+        db["one"] = "bar"
+        db["two"] = "bar"
+        db.verify_all()
+
+    with savestate.open(SAVESTATE_FILE, flag="r") as db:
+        db.verify_all()
+
+        # Write garbage to the second value after the index has been loaded.
+        with open(db.filepath, "r+b") as f:
+            f.seek(13 + 8 + 18 + 18 + 4 + 8 + 18)
+            f.write(b"\x00" * 8)
+
+        with pytest.raises(savestate.SaveStateChecksumError):
+            db.verify_all()
+
+
 # --- Test compaction ----------------------------------------------------
 
 
@@ -480,6 +758,38 @@ def test_compact_set_and_get(savestate_db):
     assert len(savestate_db) == 10
 
 
+def test_compact_keeps_key_order_and_checksums():
+    with savestate.open(filename=SAVESTATE_FILE, flag="n") as db:
+        db["one"] = 1
+        db["two"] = 2
+        db["three"] = 3
+        db["one"] = "foo"
+        del db["two"]
+        db["two"] = "bar"
+        db.compact()
+        assert db.items() == [("one", "foo"), ("three", 3), ("two", "bar")]
+
+    with savestate.open(filename=SAVESTATE_FILE, flag="r", verify_checksums=True) as db:
+        db.verify_all()
+        assert db.items() == [("one", "foo"), ("three", 3), ("two", "bar")]
+
+
+def test_compact_large_contiguous_records():
+    values = {i: os.urandom(savestate.savestate.COPY_RANGE_MIN_SIZE // 4) for i in range(8)}
+
+    with savestate.open(filename=SAVESTATE_FILE, flag="n") as db:
+        db.update(values)
+        del db[3]
+        db.compact()
+        del values[3]
+        assert db.items() == list(values.items())
+        db["foo"] = "bar"
+
+    with savestate.open(filename=SAVESTATE_FILE, flag="r", verify_checksums=True) as db:
+        db.verify_all()
+        assert db.items() == [*values.items(), ("foo", "bar")]
+
+
 # --- Test corrupted data ------------------------------------------------
 
 
@@ -500,6 +810,17 @@ def test_bad_file_identifier_raises_error():
         savestate.open(filename=SAVESTATE_FILE, flag="c")
 
 
+def test_truncated_header_raises_error():
+    with savestate.open(filename=SAVESTATE_FILE, flag="n") as db:
+        db["foo"] = "bar"
+
+    with open(db.filepath, "r+b") as f:
+        f.truncate(5)
+
+    with pytest.raises(savestate.SaveStateLoadError, match="File is not a SaveState file."):
+        savestate.open(filename=SAVESTATE_FILE, flag="c")
+
+
 def test_incompatible_version_number_raises_error():
     with savestate.open(filename=SAVESTATE_FILE, flag="n") as db:
         db["foo"] = "bar"